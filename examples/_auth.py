@@ -0,0 +1,38 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from azure.identity import DefaultAzureCredential
+
+AZURE_OSSRDBMS_SCOPE = "https://ossrdbms-aad.database.windows.net/.default"
+TOKEN_CACHE_PATH = Path.home() / ".cache" / "azure_pgvector_token.json"
+# Re-acquire a cached token this many seconds before it actually expires
+TOKEN_REFRESH_MARGIN = 300
+
+
+def get_pg_password(host: str) -> str:
+    """Return the password (or AAD access token) to use for the given PostgreSQL host.
+
+    For Azure Database for PostgreSQL, DefaultAzureCredential probes a chain of
+    credential sources, which can take seconds per run. The resulting token is valid
+    for about an hour, so it is cached on disk and only re-acquired close to expiry.
+    """
+    if not host.endswith(".database.azure.com"):
+        return os.environ["POSTGRES_PASSWORD"]
+
+    if TOKEN_CACHE_PATH.exists():
+        try:
+            cached = json.loads(TOKEN_CACHE_PATH.read_text())
+            if cached["expires_on"] - time.time() > TOKEN_REFRESH_MARGIN:
+                return cached["token"]
+        except (ValueError, KeyError):
+            pass  # unreadable cache entry, fall through and re-acquire
+
+    print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
+    azure_credential = DefaultAzureCredential(exclude_interactive_browser_credential=True)
+    token = azure_credential.get_token(AZURE_OSSRDBMS_SCOPE)
+    TOKEN_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    TOKEN_CACHE_PATH.touch(mode=0o600, exist_ok=True)
+    TOKEN_CACHE_PATH.write_text(json.dumps({"token": token.token, "expires_on": token.expires_on}))
+    return token.token
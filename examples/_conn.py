@@ -0,0 +1,76 @@
+import functools
+
+import psycopg
+from _auth import get_pg_password
+from _env import POSTGRES_DATABASE, POSTGRES_HOST, POSTGRES_SSL, POSTGRES_USERNAME
+from pgvector.psycopg import register_vector
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+POSTGRES_PASSWORD = get_pg_password(POSTGRES_HOST)
+
+DATABASE_URI = f"postgresql+psycopg://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
+ASYNC_DATABASE_URI = f"postgresql+asyncpg://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
+# Specify SSL mode if needed
+if POSTGRES_SSL:
+    DATABASE_URI += f"?sslmode={POSTGRES_SSL}"
+    ASYNC_DATABASE_URI += f"?ssl={POSTGRES_SSL}"
+
+APPLICATION_NAME = "azure-pgvector-example"
+CONNECT_TIMEOUT = 10
+# TCP keepalives stop idle pooled connections to Azure from being dropped silently
+KEEPALIVE_ARGS = {"keepalives": 1, "keepalives_idle": 30}
+
+
+@functools.lru_cache(maxsize=1)
+def sync_engine() -> Engine:
+    """Process-wide sync engine: every caller shares one connection pool, so the
+    TCP + TLS + auth handshake to Azure Postgres is paid once per pooled connection."""
+    return create_engine(
+        DATABASE_URI,
+        echo=False,
+        pool_size=5,
+        max_overflow=0,
+        pool_recycle=1800,
+        pool_pre_ping=False,
+        connect_args={
+            "application_name": APPLICATION_NAME,
+            "connect_timeout": CONNECT_TIMEOUT,
+            **KEEPALIVE_ARGS,
+        },
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def async_engine() -> AsyncEngine:
+    """Process-wide async engine; see sync_engine for the pooling rationale."""
+    return create_async_engine(
+        ASYNC_DATABASE_URI,
+        echo=False,
+        pool_size=5,
+        max_overflow=0,
+        pool_recycle=1800,
+        connect_args={
+            "server_settings": {"application_name": APPLICATION_NAME},
+            "timeout": CONNECT_TIMEOUT,
+        },
+    )
+
+
+def psycopg_conn() -> psycopg.Connection:
+    """New autocommit psycopg connection with the pgvector adapter registered,
+    so vectors always travel in binary form."""
+    conn = psycopg.connect(
+        dbname=POSTGRES_DATABASE,
+        user=POSTGRES_USERNAME,
+        password=POSTGRES_PASSWORD,
+        host=POSTGRES_HOST,
+        application_name=APPLICATION_NAME,
+        connect_timeout=CONNECT_TIMEOUT,
+        autocommit=True,
+        **KEEPALIVE_ARGS,
+        **({"sslmode": POSTGRES_SSL} if POSTGRES_SSL else {}),
+    )
+    conn.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    register_vector(conn)
+    return conn
@@ -0,0 +1,12 @@
+import os
+
+from dotenv import load_dotenv
+
+# Parse the .env file exactly once per process; Python's module cache makes every
+# importer share these constants, so repeated script imports pay no file I/O
+load_dotenv(".env", override=True)
+
+POSTGRES_HOST = os.environ["POSTGRES_HOST"]
+POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
+POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
+POSTGRES_SSL = os.environ.get("POSTGRES_SSL")
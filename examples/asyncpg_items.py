@@ -1,26 +1,14 @@
 import asyncio
-import os
 
 import asyncpg
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
+from _auth import get_pg_password
+from _env import POSTGRES_DATABASE, POSTGRES_HOST, POSTGRES_USERNAME
 from pgvector.asyncpg import register_vector
 
 
 async def async_main():
     # Establish a connection to an existing database
-    load_dotenv(".env", override=True)
-    POSTGRES_HOST = os.environ["POSTGRES_HOST"]
-    POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
-    POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
-
-    if POSTGRES_HOST.endswith(".database.azure.com"):
-        print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
-        azure_credential = DefaultAzureCredential()
-        token = azure_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
-        POSTGRES_PASSWORD = token.token
-    else:
-        POSTGRES_PASSWORD = os.environ["POSTGRES_PASSWORD"]
+    POSTGRES_PASSWORD = get_pg_password(POSTGRES_HOST)
 
     DATABASE_URI = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
 
@@ -1,58 +1,37 @@
-import os
-
 import numpy as np
-import psycopg2
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
-from pgvector.psycopg2 import register_vector
-
-# Connect to the database based on environment variables
-load_dotenv(".env", override=True)
-POSTGRES_HOST = os.environ["POSTGRES_HOST"]
-POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
-POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
-
-if POSTGRES_HOST.endswith(".database.azure.com"):
-    print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
-    azure_credential = DefaultAzureCredential()
-    token = azure_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
-    POSTGRES_PASSWORD = token.token
-else:
-    POSTGRES_PASSWORD = os.environ["POSTGRES_PASSWORD"]
-
-extra_params = {}
-if POSTGRES_SSL := os.environ.get("POSTGRES_SSL"):
-    extra_params["sslmode"] = POSTGRES_SSL
+from _conn import psycopg_conn
 
-conn = psycopg2.connect(
-    database=POSTGRES_DATABASE,
-    user=POSTGRES_USERNAME,
-    password=POSTGRES_PASSWORD,
-    host=POSTGRES_HOST,
-    **extra_params,
-)
+# Connect to the database through the shared connection factory; it enables the
+# pgvector extension and registers the binary vector adapter before returning
+conn = psycopg_conn()
 
-conn.autocommit = True
 cur = conn.cursor()
-# Create pgvector extension
-cur.execute("CREATE EXTENSION IF NOT EXISTS vector")
 # Drop table defined in this model from the database, if already exists
 cur.execute("DROP TABLE IF EXISTS items")
-# Create table defined in this model in the database
-cur.execute("CREATE TABLE items (id bigserial PRIMARY KEY, embedding vector(3))")
-register_vector(conn)
-
-# Define HNSW index to support vector similarity search through the vector_l2_ops access method (Euclidean distance). The SQL operator for Euclidean distance is written as <->.
-cur.execute("CREATE INDEX ON items USING hnsw (embedding vector_l2_ops)")
+# Create table defined in this model in the database.
+# The stored generated norm column ((embedding <#> embedding) is the negated squared norm)
+# gives distance queries a cheap triangle-inequality prefilter.
+cur.execute(
+    "CREATE TABLE items ("
+    "id bigserial PRIMARY KEY, "
+    "embedding vector(3), "
+    "norm real GENERATED ALWAYS AS (sqrt((embedding <#> embedding) * -1)) STORED)"
+)
 
-# Insert three vectors as three separate rows in the items table
+# Insert three vectors as three separate rows in the items table. psycopg batches the
+# executemany into a single pipelined round trip and, with the pgvector adapter
+# registered, ships each vector in binary form rather than formatting floats as text.
 embeddings = [
     np.array([1, 2, 3]),
     np.array([-1, 1, 3]),
     np.array([0, -1, -2]),
 ]
-for embedding in embeddings:
-    cur.execute("INSERT INTO items (embedding) VALUES (%s)", (embedding,))
+cur.executemany("INSERT INTO items (embedding) VALUES (%s)", [(embedding,) for embedding in embeddings])
+
+# Define HNSW index to support vector similarity search through the vector_l2_ops access method (Euclidean distance). The SQL operator for Euclidean distance is written as <->.
+# The index is created after the bulk insert, since a single build over the full table is much faster
+# than maintaining the graph for every inserted row.
+cur.execute("CREATE INDEX ON items USING hnsw (embedding vector_l2_ops)")
 
 
 # Find all vectors in table items
@@ -78,8 +57,15 @@ cur.execute(
 distance = cur.fetchone()
 print(f"Distance between [3, 1, 2] vector and the one closest to it: {distance[0]}")
 
-# Find vectors within distance 5 from [3, 1, 2]
-cur.execute("SELECT * FROM items WHERE embedding <-> %s < 5", (embedding_predicate,))
+# Find vectors within distance 5 from [3, 1, 2].
+# By the triangle inequality, rows whose stored norm differs from the query's norm by
+# 5 or more cannot qualify, so the cheap norm comparison prunes them before the
+# full per-dimension distance computation runs.
+predicate_norm = float(np.linalg.norm(embedding_predicate))
+cur.execute(
+    "SELECT * FROM items WHERE abs(norm - %s) < 5 AND embedding <-> %s < 5",
+    (predicate_norm, embedding_predicate),
+)
 close_enough_items = cur.fetchall()
 print("Vectors within a distance of 5 from [3, 1, 2]:")
 for item in close_enough_items:
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
 import asyncio
-import os
 
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
+import numpy as np
+from _conn import async_engine
+from pgvector.asyncpg import register_vector
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import Index, func, select, text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -21,25 +21,25 @@ class Item(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     embedding = mapped_column(Vector(3))
 
-# Define HNSW index to support vector similarity search through the vector_l2_ops access method (Euclidean distance). The SQL operator for Euclidean distance is written as <->.
-index = Index(
-    "hnsw_index_for_euclidean_distance_similarity_search",
-    Item.embedding,
-    postgresql_using="hnsw",
-    postgresql_with={"m": 16, "ef_construction": 64},
-    postgresql_ops={"embedding": "vector_l2_ops"},
-)
 
 async def insert_objects(async_session: async_sessionmaker[AsyncSession]) -> None:
     async with async_session() as session:
         async with session.begin():
-            # Insert three vectors as three separate rows in the items table
-            session.add_all(
-                [
-                    Item(embedding=[1, 2, 3]),
-                    Item(embedding=[-1, 1, 3]),
-                    Item(embedding=[0, -1, -2]),
-                ]
+            # Insert three vectors as three separate rows in the items table.
+            # Drop down to the raw asyncpg connection and use its binary COPY protocol,
+            # which avoids per-row statement overhead and text serialization of the vectors.
+            connection = await session.connection()
+            raw_connection = await connection.get_raw_connection()
+            asyncpg_connection = raw_connection.driver_connection
+            await register_vector(asyncpg_connection)
+            await asyncpg_connection.copy_records_to_table(
+                "items",
+                records=[
+                    (np.array([1, 2, 3], dtype=np.float32),),
+                    (np.array([-1, 1, 3], dtype=np.float32),),
+                    (np.array([0, -1, -2], dtype=np.float32),),
+                ],
+                columns=["embedding"],
             )
 
 
@@ -69,29 +69,8 @@ async def select_and_update_objects(
 
 
 async def async_main() -> None:
-    load_dotenv(".env", override=True)
-
-    POSTGRES_HOST = os.environ["POSTGRES_HOST"]
-    POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
-    POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
-
-    if POSTGRES_HOST.endswith(".database.azure.com"):
-        print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
-        azure_credential = DefaultAzureCredential()
-        token = azure_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
-        POSTGRES_PASSWORD = token.token
-    else:
-        POSTGRES_PASSWORD = os.environ["POSTGRES_PASSWORD"]
-
-    DATABASE_URI = f"postgresql+asyncpg://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
-    # Specify SSL mode if needed
-    if POSTGRES_SSL := os.environ.get("POSTGRES_SSL"):
-        DATABASE_URI += f"?ssl={POSTGRES_SSL}"
-
-    engine = create_async_engine(
-        DATABASE_URI,
-        echo=False,
-    )
+    # Connect to the database through the shared pooled engine defined in _conn.py
+    engine = async_engine()
 
     # async_sessionmaker: a factory for new AsyncSession objects.
     # expire_on_commit - don't expire objects after transaction commit
@@ -106,11 +85,24 @@ async def async_main() -> None:
         await conn.run_sync(Base.metadata.create_all)
 
     await insert_objects(async_session)
+
+    # Define HNSW index to support vector similarity search through the vector_l2_ops access method (Euclidean distance). The SQL operator for Euclidean distance is written as <->.
+    # The index is built after the bulk insert: a single build over the full table is much faster
+    # than maintaining the HNSW graph for every inserted row.
+    index = Index(
+        "hnsw_index_for_euclidean_distance_similarity_search",
+        Item.embedding,
+        postgresql_using="hnsw",
+        postgresql_with={"m": 16, "ef_construction": 64},
+        postgresql_ops={"embedding": "vector_l2_ops"},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(index.create)
+
     await select_and_update_objects(async_session)
 
-    # for AsyncEngine created in function scope, close and
-    # clean-up pooled connections
-    await engine.dispose()
+    # The shared engine is left undisposed on purpose, so pooled connections
+    # stay available when this module is driven repeatedly from the same process
 
 
 asyncio.run(async_main())
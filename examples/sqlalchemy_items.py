@@ -1,9 +1,7 @@
-import os
-
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
+import numpy as np
+from _conn import sync_engine
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Index, create_engine, func, select, text
+from sqlalchemy import Computed, Float, Index, func, insert, select, text
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
 
 
@@ -16,6 +14,9 @@ class Item(Base):
     __tablename__ = "items"
     id: Mapped[int] = mapped_column(primary_key=True)
     embedding = mapped_column(Vector(3))
+    # Stored generated vector norm ((embedding <#> embedding) is the negated squared norm);
+    # gives distance queries a cheap triangle-inequality prefilter
+    norm = mapped_column(Float, Computed("sqrt((embedding <#> embedding) * -1)"))
 
 # Define HNSW index to support vector similarity search through the vector_l2_ops access method (Euclidean distance). The SQL operator for Euclidean distance is written as <->.
 index = Index(
@@ -26,69 +27,69 @@ index = Index(
     postgresql_ops={"embedding": "vector_l2_ops"},
 )
 
-# Connect to the database based on environment variables
-load_dotenv(".env", override=True)
-POSTGRES_HOST = os.environ["POSTGRES_HOST"]
-POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
-POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
-
-if POSTGRES_HOST.endswith(".database.azure.com"):
-    print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
-    azure_credential = DefaultAzureCredential()
-    token = azure_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
-    POSTGRES_PASSWORD = token.token
-else:
-    POSTGRES_PASSWORD = os.environ["POSTGRES_PASSWORD"]
-
-DATABASE_URI = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
-# Specify SSL mode if needed
-if POSTGRES_SSL := os.environ.get("POSTGRES_SSL"):
-    DATABASE_URI += f"?sslmode={POSTGRES_SSL}"
-
-engine = create_engine(DATABASE_URI, echo=False)
+# Connect to the database through the shared pooled engine defined in _conn.py
+engine = sync_engine()
 
-# Create pgvector extension
+# Create the pgvector extension and recreate the schema in one transaction on one
+# connection: three separate handshakes collapse into one, and a failure part-way
+# through cannot leave a half-recreated schema behind
 with engine.begin() as conn:
+    # Create pgvector extension
     conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-
-# Drop all tables (and indexes) defined in this model from the database, if they already exist
-Base.metadata.drop_all(engine)
-# Create all tables (and indexes) defined for this model in the database
-Base.metadata.create_all(engine)
+    # Drop all tables (and indexes) defined in this model from the database, if they already exist
+    Base.metadata.drop_all(conn)
+    # Create all tables (and indexes) defined for this model in the database
+    Base.metadata.create_all(conn)
 
 # Insert data and issue queries
 with Session(engine) as session:
 
-    # Insert three vectors as three separate rows in the items table
-    session.add_all(
+    # Insert three vectors as three separate rows in the items table,
+    # as a single Core executemany that skips per-object ORM instrumentation.
+    # Contiguous float32 numpy arrays take the adapter's fast serialization path.
+    session.execute(
+        insert(Item),
         [
-            Item(embedding=[1, 2, 3]),
-            Item(embedding=[-1, 1, 3]),
-            Item(embedding=[0, -1, -2]),
-        ]
+            {"embedding": np.array([1, 2, 3], dtype=np.float32)},
+            {"embedding": np.array([-1, 1, 3], dtype=np.float32)},
+            {"embedding": np.array([0, -1, -2], dtype=np.float32)},
+        ],
     )
 
-    # Find all vectors in table items
-    all_items = session.scalars(select(Item))
+    # Find all vectors in table items; select just the embedding column,
+    # since nothing else from the row is used. Stream from a server-side cursor
+    # in windows of 1000 rows so client memory stays bounded on large tables.
+    all_embeddings = session.scalars(select(Item.embedding).execution_options(stream_results=True, yield_per=1000))
     print("All vectors in table items:")
-    for item in all_items:
-        print(f"\t{item.embedding}")
+    for embedding in all_embeddings:
+        print(f"\t{embedding}")
 
     # Find 2 closest vectors to [3, 1, 2]
-    closest_items = session.scalars(select(Item).order_by(Item.embedding.l2_distance([3, 1, 2])).limit(2))
+    closest_embeddings = session.scalars(
+        select(Item.embedding).order_by(Item.embedding.l2_distance([3, 1, 2])).limit(2)
+    )
     print("Two closest vectors to [3, 1, 2] in table items:")
-    for item in closest_items:
-        print(f"\t{item.embedding}")
+    for embedding in closest_embeddings:
+        print(f"\t{embedding}")
 
     # Calculate distance between [3, 1, 2] and the first vector
     distance = session.scalars(select(Item.embedding.l2_distance([3, 1, 2]))).first()
     print(f"Distance between [3, 1, 2] vector and the one closest to it: {distance}")
 
-    # Find vectors within distance 5 from [3, 1, 2]
-    close_enough_items = session.scalars(select(Item).filter(Item.embedding.l2_distance([3, 1, 2]) < 5))
+    # Find vectors within distance 5 from [3, 1, 2].
+    # By the triangle inequality, rows whose stored norm differs from the query's norm
+    # by 5 or more cannot qualify, so the cheap norm comparison prunes them before the
+    # full per-dimension distance computation runs.
+    predicate_norm = float(np.linalg.norm([3, 1, 2]))
+    close_enough_embeddings = session.scalars(
+        select(Item.embedding).filter(
+            func.abs(Item.norm - predicate_norm) < 5,
+            Item.embedding.l2_distance([3, 1, 2]) < 5,
+        )
+    )
     print("Vectors within a distance of 5 from [3, 1, 2]:")
-    for item in close_enough_items:
-        print(f"\t{item.embedding}")
+    for embedding in close_enough_embeddings:
+        print(f"\t{embedding}")
 
     # Calculate average of all vectors
     avg_embedding = session.scalars(select(func.avg(Item.embedding))).first()
@@ -1,10 +1,8 @@
-import os
-
-from azure.identity import DefaultAzureCredential
-from dotenv import load_dotenv
+import numpy as np
+from _conn import sync_engine
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import Column
-from sqlmodel import Field, Session, SQLModel, create_engine, func, select
+from sqlmodel import Field, Session, SQLModel, func, select
 
 
 class Item(SQLModel, table=True):
@@ -12,36 +10,22 @@ class Item(SQLModel, table=True):
     embedding: list[float] = Field(sa_column=Column(Vector(3)))
 
 
-# Connect to the database
-load_dotenv(".env", override=True)
-POSTGRES_HOST = os.environ["POSTGRES_HOST"]
-POSTGRES_USERNAME = os.environ["POSTGRES_USERNAME"]
-POSTGRES_DATABASE = os.environ["POSTGRES_DATABASE"]
-
-if POSTGRES_HOST.endswith(".database.azure.com"):
-    print("Authenticating to Azure Database for PostgreSQL using Azure Identity...")
-    azure_credential = DefaultAzureCredential()
-    token = azure_credential.get_token("https://ossrdbms-aad.database.windows.net/.default")
-    POSTGRES_PASSWORD = token.token
-else:
-    POSTGRES_PASSWORD = os.environ["POSTGRES_PASSWORD"]
-
-DATABASE_URI = f"postgresql://{POSTGRES_USERNAME}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}/{POSTGRES_DATABASE}"
-# Specify SSL mode if needed
-if POSTGRES_SSL := os.environ.get("POSTGRES_SSL"):
-    DATABASE_URI += f"?sslmode={POSTGRES_SSL}"
-
-engine = create_engine(DATABASE_URI, echo=False)
+# Connect to the database through the shared pooled engine defined in _conn.py
+engine = sync_engine()
 
-SQLModel.metadata.drop_all(engine)
-SQLModel.metadata.create_all(engine)
+# Recreate the schema in one transaction on one connection, so a failure part-way
+# through cannot leave a half-recreated schema behind
+with engine.begin() as conn:
+    SQLModel.metadata.drop_all(conn)
+    SQLModel.metadata.create_all(conn)
 
 with Session(engine) as session:
+    # Contiguous float32 numpy arrays take the adapter's fast serialization path
     session.add_all(
         [
-            Item(embedding=[1, 2, 3]),
-            Item(embedding=[-1, 1, 3]),
-            Item(embedding=[0, -1, -2]),
+            Item(embedding=np.array([1, 2, 3], dtype=np.float32)),
+            Item(embedding=np.array([-1, 1, 3], dtype=np.float32)),
+            Item(embedding=np.array([0, -1, -2], dtype=np.float32)),
         ]
     )
 